@@ -1,18 +1,199 @@
 import os
+import json
+import multiprocessing
+import struct
+import threading
+import traceback
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 import soundfile
 import numpy as np
-import urllib
 
 from typing import List
 from PySide6.QtCore import *
 from PySide6.QtWidgets import *
 from PySide6.QtGui import *
-from slicer2 import Slicer
+from slicer2 import Slicer, set_rms_threads
 
 from gui.Ui_MainWindow import Ui_MainWindow
 
 
+@dataclass(frozen=True)
+class SliceParams:
+    threshold: float
+    min_length: int
+    min_interval: int
+    hop_size: int
+    max_sil_kept: int
+    out_dir: str
+    pack: bool = False
+    rms_threads: int = 1  # Numba threads per file, so the whole batch fills the cores once
+
+
+# WAV subtypes whose samples can be mapped straight from disk
+MEMMAP_SUBTYPES = {
+    'PCM_16': np.dtype('<i2'),
+    'FLOAT': np.dtype('<f4')
+}
+
+
+def find_wav_data_offset(filename: str):
+    with open(filename, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:] != b'WAVE':
+            return None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                return None
+            chunk_size = int.from_bytes(chunk_header[4:], 'little')
+            if chunk_header[:4] == b'data':
+                return f.tell()
+            # Chunks are padded to an even size
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+def read_audio(filename: str):
+    # Map uncompressed WAV data instead of decoding the whole file into memory
+    info = soundfile.info(filename)
+    dtype = MEMMAP_SUBTYPES.get(info.subtype)
+    if info.format == 'WAV' and dtype is not None and info.frames > 0:
+        offset = find_wav_data_offset(filename)
+        if offset is not None:
+            shape = (info.frames,) if info.channels == 1 else (
+                info.frames, info.channels)
+            audio = np.memmap(filename, dtype=dtype, mode='r',
+                              offset=offset, shape=shape)
+            return audio, info.samplerate
+    return soundfile.read(filename, dtype=np.float32)
+
+
+def to_pcm16(audio: np.ndarray):
+    if audio.dtype == np.int16:
+        return audio
+    # Same scaling as soundfile uses for the per-chunk output
+    return np.clip(np.floor(audio * 32768.), -32768, 32767)
+
+
+def write_packed(path: str, audio: np.ndarray, sr: int, ranges: List[tuple]):
+    # Writes all slices of frame-major audio into one 16-bit PCM WAV, in order
+    channels = 1 if len(audio.shape) == 1 else audio.shape[1]
+    total = sum(end - begin for begin, end in ranges)
+    data_size = total * channels * 2
+    header = struct.pack('<4sI4s4sIHHIIHH4sI',
+                         b'RIFF', 36 + data_size, b'WAVE',
+                         b'fmt ', 16, 1, channels, sr, sr * channels * 2, channels * 2, 16,
+                         b'data', data_size)
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.truncate(len(header) + data_size)
+    index = []
+    if total > 0:
+        shape = (total,) if channels == 1 else (total, channels)
+        out = np.memmap(path, dtype='<i2', mode='r+',
+                        offset=len(header), shape=shape)
+        offset = 0
+        for begin, end in ranges:
+            out[offset: offset + end - begin] = to_pcm16(audio[begin: end])
+            index.append({
+                'start_frame': offset,
+                'end_frame': offset + end - begin,
+                'source_offset': begin
+            })
+            offset += end - begin
+        out.flush()
+        del out
+    return index
+
+
+def process_one(filename: str, params: SliceParams):
+    # Runs in a worker process, so it must stay at module level to be picklable
+    set_rms_threads(params.rms_threads)
+    audio, sr = read_audio(filename)
+    waveform = audio
+    is_mono = True
+    if len(audio.shape) > 1:
+        is_mono = False
+        # Slicer wants (channels, frames); this is a view, the buffer stays frame-major
+        waveform = audio.T
+    slicer = Slicer(
+        sr=sr,
+        threshold=params.threshold,
+        min_length=params.min_length,
+        min_interval=params.min_interval,
+        hop_size=params.hop_size,
+        max_sil_kept=params.max_sil_kept
+    )
+    out_dir = params.out_dir
+    if out_dir == '':
+        out_dir = os.path.dirname(os.path.abspath(filename))
+    out_prefix = os.path.join(
+        out_dir, os.path.splitext(os.path.basename(filename))[0]) + '_'
+
+    if params.pack:
+        # One WAV holding every slice, plus a JSON index of where each one lies
+        ranges = slicer.get_slice_ranges(waveform)
+        index = write_packed(f'{out_prefix}sliced.wav', audio, sr, ranges)
+        with open(f'{out_prefix}sliced.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                'source': os.path.abspath(filename),
+                'sample_rate': sr,
+                'slices': index
+            }, f, indent=2)
+        return
+
+    chunks = slicer.slice(waveform)
+    for i, chunk in enumerate(chunks):
+        path = f'{out_prefix}{i}.wav'
+        if not is_mono:
+            # Back to a contiguous block of frames, so soundfile writes it without a copy
+            chunk = chunk.T
+        soundfile.write(path, chunk, sr)
+
+
+class SliceJob(QRunnable):
+    # Outcomes reported through Signals.finished
+    DONE, FAILED, SKIPPED = range(3)
+
+    class Signals(QObject):
+        finished = Signal(int)
+
+    def __init__(self, window: 'MainWindow', filename: str, params: SliceParams,
+                 signals: Signals, cancelled: threading.Event):
+        super().__init__()
+
+        self.win = window  # Only its lock-guarded executor methods are used here
+        self.filename = filename
+        self.params = params
+        self.signals = signals
+        self.cancelled = cancelled
+
+    def run(self):
+        # Slicing itself runs in the process pool; this thread only waits for it
+        if self.cancelled.is_set():
+            self.signals.finished.emit(SliceJob.SKIPPED)
+            return
+
+        status = SliceJob.FAILED
+        # A dead worker breaks every file in flight on its pool, so retry once on a
+        # fresh pool. The file that killed the worker will most likely fail again.
+        for _ in range(2):
+            executor = self.win.getExecutor()
+            try:
+                executor.submit(process_one, self.filename, self.params).result()
+                status = SliceJob.DONE
+                break
+            except BrokenProcessPool:
+                traceback.print_exc()
+                self.win.dropExecutor(executor)
+            except Exception:
+                traceback.print_exc()
+                break
+        self.signals.finished.emit(status)
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super(MainWindow, self).__init__()
@@ -41,10 +222,20 @@ class MainWindow(QMainWindow):
         self.ui.listWidgetTaskList.setAlternatingRowColors(True)
 
         # State variables
-        self.workers: list[QThread] = []
         self.workCount = 0
         self.workFinished = 0
+        self.workFailed = 0
+        self.workSkipped = 0
         self.processing = False
+        self.cancelled = threading.Event()
+        self.executor: ProcessPoolExecutor = None
+        self.executorLock = threading.Lock()
+        self.threadPool = QThreadPool.globalInstance()
+        self.threadPool.setMaxThreadCount(os.cpu_count())
+        self.jobSignals = SliceJob.Signals()
+        self.jobSignals.finished.connect(
+            self._q_oneFinished, Qt.ConnectionType.QueuedConnection)
+        self.paths: list[str] = []  # Full paths, in task list order
 
         self.setWindowTitle(QApplication.applicationName())
 
@@ -71,6 +262,7 @@ class MainWindow(QMainWindow):
             # Save full path at custom role
             item.setData(Qt.ItemDataRole.UserRole + 1, path)
             self.ui.listWidgetTaskList.addItem(item)
+            self.paths.append(path)
 
     def _q_clear_audio_list(self):
         if self.processing:
@@ -78,6 +270,7 @@ class MainWindow(QMainWindow):
             return
 
         self.ui.listWidgetTaskList.clear()
+        self.paths.clear()
 
     def _q_about(self):
         QMessageBox.information(
@@ -85,92 +278,94 @@ class MainWindow(QMainWindow):
 
     def _q_start(self):
         if self.processing:
-            self.warningProcessNotFinished()
+            # Files already being sliced run to completion, the rest are skipped
+            self.cancelled.set()
+            self.ui.pushButtonStart.setText("Cancelling...")
+            self.ui.pushButtonStart.setEnabled(False)
             return
 
-        item_count = self.ui.listWidgetTaskList.count()
+        item_count = len(self.paths)
         if item_count == 0:
             return
 
-        class WorkThread(QThread):
-            oneFinished = Signal()
-
-            def __init__(self, filenames: List[str], window: MainWindow):
-                super().__init__()
-
-                self.filenames = filenames
-                self.win = window
-
-            def run(self):
-                for filename in self.filenames:
-                    audio, sr = soundfile.read(filename, dtype=np.float32)
-                    is_mono = True
-                    if len(audio.shape) > 1:
-                        is_mono = False
-                        audio = audio.T
-                    slicer = Slicer(
-                        sr=sr,
-                        threshold=float(self.win.ui.lineEditThreshold.text()),
-                        min_length=int(self.win.ui.lineEditMinLen.text()),
-                        min_interval=int(
-                            self.win.ui.lineEditMinInterval.text()),
-                        hop_size=int(self.win.ui.lineEditHopSize.text()),
-                        max_sil_kept=int(self.win.ui.lineEditMaxSilence.text())
-                    )
-                    chunks = slicer.slice(audio)
-                    out_dir = self.win.ui.lineEditOutputDir.text()
-                    if out_dir == '':
-                        out_dir = os.path.dirname(os.path.abspath(filename))
-                    else:
-                        # Make dir if not exists
-                        info = QDir(out_dir)
-                        if not info.exists():
-                            info.mkpath(out_dir)
-
-                    for i, chunk in enumerate(chunks):
-                        path = os.path.join(out_dir, f'%s_%d.wav' % (os.path.basename(filename)
-                                                                     .rsplit('.', maxsplit=1)[0], i))
-                        if not is_mono:
-                            chunk = chunk.T
-                        soundfile.write(path, chunk, sr)
-
-                    self.oneFinished.emit()
-
-        # Collect paths
-        paths: list[str] = []
-        for i in range(0, item_count):
-            item = self.ui.listWidgetTaskList.item(i)
-            path = item.data(Qt.ItemDataRole.UserRole + 1)  # Get full path
-            paths.append(path)
+        # Snapshot parameters on the GUI thread
+        params = SliceParams(
+            threshold=float(self.ui.lineEditThreshold.text()),
+            min_length=int(self.ui.lineEditMinLen.text()),
+            min_interval=int(self.ui.lineEditMinInterval.text()),
+            hop_size=int(self.ui.lineEditHopSize.text()),
+            max_sil_kept=int(self.ui.lineEditMaxSilence.text()),
+            out_dir=self.ui.lineEditOutputDir.text(),
+            pack=self.ui.checkBoxPack.isChecked(),
+            rms_threads=max(1, os.cpu_count() // min(item_count, os.cpu_count()))
+        )
+        if params.out_dir != '':
+            # Make dir if not exists
+            info = QDir(params.out_dir)
+            if not info.exists():
+                info.mkpath(params.out_dir)
+
+        paths = list(self.paths)
 
         self.ui.progressBar.setMaximum(item_count)
         self.ui.progressBar.setValue(0)
 
         self.workCount = item_count
         self.workFinished = 0
+        self.workFailed = 0
+        self.workSkipped = 0
+        self.cancelled.clear()
         self.setProcessing(True)
 
-        # Start work thread
-        worker = WorkThread(paths, self)
-        worker.oneFinished.connect(self._q_oneFinished)
-        worker.finished.connect(self._q_threadFinished)
-        worker.start()
-
-        self.workers.append(worker)  # Collect in case of auto deletion
+        # Start one job per file
+        for path in paths:
+            self.threadPool.start(SliceJob(
+                self, path, params, self.jobSignals, self.cancelled))
 
-    def _q_oneFinished(self):
+    def _q_oneFinished(self, status: int):
         self.workFinished += 1
+        if status == SliceJob.FAILED:
+            self.workFailed += 1
+        elif status == SliceJob.SKIPPED:
+            self.workSkipped += 1
         self.ui.progressBar.setValue(self.workFinished)
+        if self.workFinished < self.workCount:
+            return
 
-    def _q_threadFinished(self):
-        # Join all workers
-        for worker in self.workers:
-            worker.wait()
-        self.workers.clear()
         self.setProcessing(False)
 
-        QMessageBox.information(
-            self, QApplication.applicationName(), "Slicing complete!")
+        if self.workFailed == 0 and self.workSkipped == 0:
+            QMessageBox.information(
+                self, QApplication.applicationName(), "Slicing complete!")
+            return
+
+        sliced = self.workCount - self.workFailed - self.workSkipped
+        message = f"{sliced} of {self.workCount} files sliced."
+        if self.workSkipped > 0:
+            message += f" {self.workSkipped} skipped (cancelled)."
+        if self.workFailed > 0:
+            message += f" {self.workFailed} failed. See the log for details."
+            QMessageBox.warning(self, QApplication.applicationName(), message)
+        else:
+            QMessageBox.information(
+                self, QApplication.applicationName(), message)
+
+    def getExecutor(self):
+        # Called from SliceJob threads, creates a new pool if the last one broke
+        with self.executorLock:
+            if self.executor is None:
+                # Never fork a multi-threaded Qt process; spawn like the Windows build does
+                self.executor = ProcessPoolExecutor(
+                    max_workers=os.cpu_count(),
+                    mp_context=multiprocessing.get_context('spawn'))
+            return self.executor
+
+    def dropExecutor(self, executor: ProcessPoolExecutor):
+        # Called from SliceJob threads once executor is broken
+        with self.executorLock:
+            if self.executor is executor:
+                self.executor = None
+        executor.shutdown(wait=False)
 
     def warningProcessNotFinished(self):
         QMessageBox.warning(self, QApplication.applicationName(),
@@ -179,8 +374,8 @@ class MainWindow(QMainWindow):
     def setProcessing(self, processing: bool):
         enabled = not processing
         self.ui.pushButtonStart.setText(
-            "Slicing..." if processing else "Start")
-        self.ui.pushButtonStart.setEnabled(enabled)
+            "Cancel" if processing else "Start")
+        self.ui.pushButtonStart.setEnabled(True)
         self.ui.pushButtonAddFiles.setEnabled(enabled)
         self.ui.listWidgetTaskList.setEnabled(enabled)
         self.ui.pushButtonClearList.setEnabled(enabled)
@@ -191,6 +386,7 @@ class MainWindow(QMainWindow):
         self.ui.lineEditMaxSilence.setEnabled(enabled)
         self.ui.lineEditOutputDir.setEnabled(enabled)
         self.ui.pushButtonBrowse.setEnabled(enabled)
+        self.ui.checkBoxPack.setEnabled(enabled)
         self.processing = processing
 
     # Event Handlers
@@ -198,6 +394,12 @@ class MainWindow(QMainWindow):
         if self.processing:
             self.warningProcessNotFinished()
             event.ignore()
+            return
+
+        with self.executorLock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
 
     def dragEnterEvent(self, event):
         urls = event.mimeData().urls()
@@ -228,3 +430,4 @@ class MainWindow(QMainWindow):
             item.setData(Qt.ItemDataRole.UserRole + 1,
                          path)
             self.ui.listWidgetTaskList.addItem(item)
+            self.paths.append(path)
@@ -1,6 +1,7 @@
 import os
 import sys
 import datetime
+import multiprocessing
 import qdarktheme
 from PySide6.QtWidgets import QApplication, QStyleFactory
 from PySide6.QtGui import QFont
@@ -8,6 +9,9 @@ from PySide6.QtGui import QFont
 import gui.mainwindow
 
 if __name__ == '__main__':
+    # Required by the slicing process pool in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
+
     # Write console outputs to log file.
     __stderr__ = sys.stderr
     date_time = datetime.datetime.now().strftime('%Y_%m_%d_%H_%M_%S')
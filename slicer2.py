@@ -4,6 +4,11 @@ from argparse import ArgumentParser
 import numpy as np
 import soundfile
 
+try:
+    from numba import njit, prange, set_num_threads
+except ImportError:
+    njit = None
+
 
 # This function is obtained from librosa.
 def get_rms(
@@ -42,6 +47,31 @@ def get_rms(
     return np.sqrt(power)
 
 
+if njit is not None:
+    # Same frames as get_rms(), without materializing the strided windows.
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _rms_windows(y, hop_length, frame_length):
+        pad = frame_length // 2
+        n = y.shape[0]
+        n_frames = (n + 2 * pad - frame_length) // hop_length + 1
+        rms = np.empty(n_frames, dtype=np.float64)
+        for i in prange(n_frames):
+            begin = i * hop_length - pad
+            acc = 0.
+            for j in range(max(begin, 0), min(begin + frame_length, n)):
+                acc += y[j] * y[j]
+            rms[i] = np.sqrt(acc / frame_length)
+        return rms
+else:
+    _rms_windows = None
+
+
+def set_rms_threads(n):
+    # Limits the parallel RMS kernel, e.g. when already running one process per core
+    if njit is not None:
+        set_num_threads(n)
+
+
 class Slicer:
     def __init__(self,
                  sr: int,
@@ -62,21 +92,52 @@ class Slicer:
         self.min_interval = round(min_interval / self.hop_size)
         self.max_sil_kept = round(sr * max_sil_kept / 1000 / self.hop_size)
 
-    def _apply_slice(self, waveform, begin, end):
-        if len(waveform.shape) > 1:
-            return waveform[:, begin * self.hop_size: min(waveform.shape[1], end * self.hop_size)]
-        else:
-            return waveform[begin * self.hop_size: min(waveform.shape[0], end * self.hop_size)]
+    def _get_ranges(self, sil_tags, total_frames, length):
+        # Sample ranges of the sound parts between silence tags, as (begin, end) tuples.
+        # Empty ranges, i.e. leading and trailing silence, are dropped.
+        hop_size = self.hop_size
+        if len(sil_tags) < 32:
+            # Few tags: plain arithmetic is cheaper than setting up the arrays
+            ranges = []
+            begin = 0
+            for tag_begin, tag_end in sil_tags:
+                end = min(int(tag_begin) * hop_size, length)
+                if begin < end:
+                    ranges.append((begin, end))
+                begin = int(tag_end) * hop_size
+            end = min(total_frames * hop_size, length)
+            if begin < end:
+                ranges.append((begin, end))
+            return ranges
+        tags = np.asarray(sil_tags, dtype=np.int64)
+        starts = np.concatenate(([0], tags[:, 1])) * hop_size
+        ends = np.concatenate((tags[:, 0], [total_frames])) * hop_size
+        np.minimum(ends, length, out=ends)
+        keep = starts < ends
+        return list(zip(starts[keep].tolist(), ends[keep].tolist()))
 
     # @timeit
-    def slice(self, waveform):
+    def get_slice_ranges(self, waveform):
+        # Sample ranges of the clips returned by slice(), as (begin, end) tuples
+        whole = [(0, waveform.shape[-1])]
+        if (waveform.shape[-1] + self.hop_size - 1) // self.hop_size <= self.min_length:
+            return whole
+        scale = 1.
+        if np.issubdtype(waveform.dtype, np.integer):
+            # Integer PCM (e.g. memory-mapped WAV data) is normalized to [-1, 1] for the RMS only
+            scale = 1. / 2 ** (8 * waveform.dtype.itemsize - 1)
         if len(waveform.shape) > 1:
-            samples = waveform.mean(axis=0)
+            # Mix down in one float32 reduction, then scale in place
+            samples = np.add.reduce(waveform, axis=0, dtype=np.float32)
+            samples *= scale / waveform.shape[0]
+        elif scale != 1.:
+            samples = np.multiply(waveform, scale, dtype=np.float32)
         else:
             samples = waveform
-        if (samples.shape[0] + self.hop_size - 1) // self.hop_size <= self.min_length:
-            return [waveform]
-        rms_list = get_rms(y=samples, frame_length=self.win_size, hop_length=self.hop_size).squeeze(0)
+        if _rms_windows is not None:
+            rms_list = _rms_windows(np.asarray(samples), self.hop_size, self.win_size)
+        else:
+            rms_list = get_rms(y=samples, frame_length=self.win_size, hop_length=self.hop_size).squeeze(0)
         sil_tags = []
         silence_start = None
         clip_start = 0
@@ -130,18 +191,15 @@ class Slicer:
             silence_end = min(total_frames, silence_start + self.max_sil_kept)
             pos = rms_list[silence_start: silence_end + 1].argmin() + silence_start
             sil_tags.append((pos, total_frames + 1))
-        # Apply and return slices.
+        # Return ranges of the slices.
         if len(sil_tags) == 0:
-            return [waveform]
+            return whole
         else:
-            chunks = []
-            if sil_tags[0][0] > 0:
-                chunks.append(self._apply_slice(waveform, 0, sil_tags[0][0]))
-            for i in range(len(sil_tags) - 1):
-                chunks.append(self._apply_slice(waveform, sil_tags[i][1], sil_tags[i + 1][0]))
-            if sil_tags[-1][1] < total_frames:
-                chunks.append(self._apply_slice(waveform, sil_tags[-1][1], total_frames))
-            return chunks
+            return self._get_ranges(sil_tags, total_frames, waveform.shape[-1])
+
+    def slice(self, waveform):
+        ranges = self.get_slice_ranges(waveform)
+        return [waveform[..., begin: end] for begin, end in ranges]
 
 
 def main():